@@ -0,0 +1,274 @@
+"""
+シーズンをまたいだ集計用モジュール。
+
+data/reddit/*.json を一度だけ読み込み、投稿 1 件 = 1 行の列指向の NumPy 配列
+（作品ID・シーズン・話数・コメント数・タイムスタンプ）にまとめる。
+集計（作品ごとの合計・平均、順位、パーセンタイル）はすべて配列演算で行う。
+
+使い方:
+  python scripts/analytics.py top --year 2026 --metric total -n 10
+  python scripts/analytics.py percentiles --q 50 90 99
+  python scripts/analytics.py ranks --season 2026_3_summer
+"""
+try:
+    import numpy as np
+except ImportError as e:
+    raise RuntimeError(
+        "Missing dependency 'numpy'. Install dependencies with:\n"
+        "python -m pip install -r requirements.txt"
+    ) from e
+import argparse
+import glob
+import json
+import os
+import sys
+
+from records import ArchivedPost, load_json
+
+class Archive:
+    """
+    アーカイブ全体の列指向表現。各配列は同じ長さで、i 番目の要素が投稿 i に対応する。
+
+      anime_id    int64    AniList ID
+      season      int32    seasons のインデックス（古い順）
+      episode     int32    話数
+      comments    int64    コメント数（null は 0）
+      created_utc float64  投稿日時（UNIX 秒、null は NaN）
+      archived_at datetime64[s]  アーカイブ／更新日時（null は NaT）
+    """
+
+    def __init__(self, seasons, names, anime_id, season, episode, comments, created_utc, archived_at):
+        self.seasons = seasons    # ["2025_3_summer", ...]（古い順）
+        self.names = names        # {anime_id: name_jp}
+        self.anime_id = anime_id
+        self.season = season
+        self.episode = episode
+        self.comments = comments
+        self.created_utc = created_utc
+        self.archived_at = archived_at
+
+    def __len__(self):
+        return len(self.anime_id)
+
+    def season_years(self):
+        return np.array([int(k.split("_")[0]) for k in self.seasons], dtype=np.int32)
+
+    def mask(self, year=None, seasons=None):
+        """year（int）や seasons（シーズンキーのリスト）で行を絞り込むブールマスク"""
+        m = np.ones(len(self), dtype=bool)
+        if year is not None:
+            m &= self.season_years()[self.season] == year
+        if seasons:
+            wanted = [self.seasons.index(k) for k in seasons if k in self.seasons]
+            m &= np.isin(self.season, wanted)
+        return m
+
+
+def _season_sort_key(key: str):
+    year, idx, _ = key.split("_", 2)
+    return int(year), int(idx)
+
+
+def load_archive(src_dir: str = "data/reddit") -> Archive:
+    """全シーズンファイルを読み込んで Archive を作る（エピソードごとに先頭の投稿のみ）"""
+    paths = [p for p in glob.glob(os.path.join(src_dir, "*.json")) if os.path.basename(p) != "seasons.json"]
+    seasons = sorted((os.path.splitext(os.path.basename(p))[0] for p in paths), key=_season_sort_key)
+
+    names = {}
+    anime_id, season, episode, comments, created_utc, archived_at = [], [], [], [], [], []
+    for s_idx, key in enumerate(seasons):
+        with open(os.path.join(src_dir, f"{key}.json"), "r", encoding="utf-8") as f:
+            data = load_json(f, ArchivedPost)
+        for anime_key, anime in (data.get("anime") or {}).items():
+            mid = int(anime_key)
+            names[mid] = anime.get("name_jp") or ""
+            for ep_key, posts in (anime.get("episodes") or {}).items():
+                if not posts or not ep_key.isdigit():
+                    continue
+                post = posts[0]
+                anime_id.append(mid)
+                season.append(s_idx)
+                episode.append(int(ep_key))
+                comments.append(post.num_comments or 0)
+                created_utc.append(post.created_utc if post.created_utc is not None else np.nan)
+                archived_at.append((post.archived_at or "NaT").replace(" ", "T"))
+
+    return Archive(
+        seasons=seasons,
+        names=names,
+        anime_id=np.array(anime_id, dtype=np.int64),
+        season=np.array(season, dtype=np.int32),
+        episode=np.array(episode, dtype=np.int32),
+        comments=np.array(comments, dtype=np.int64),
+        created_utc=np.array(created_utc, dtype=np.float64),
+        archived_at=np.array(archived_at, dtype="datetime64[s]"),
+    )
+
+
+# ========================
+# 集計
+# ========================
+def group_by_anime(archive: Archive, mask=None):
+    """
+    作品ごとの (ids, total, count, max) を返す。
+    np.unique の逆引きインデックスと bincount で 1 パスで集計する。
+    """
+    ids = archive.anime_id if mask is None else archive.anime_id[mask]
+    comments = archive.comments if mask is None else archive.comments[mask]
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    total = np.bincount(inverse, weights=comments, minlength=len(uniq)).astype(np.int64)
+    count = np.bincount(inverse, minlength=len(uniq))
+    peak = np.zeros(len(uniq), dtype=np.int64)
+    np.maximum.at(peak, inverse, comments)
+    return uniq, total, count, peak
+
+
+def competition_rank(values):
+    """大きい順の順位（同値は同順位、次の順位は飛ばす: 1, 2, 2, 4）"""
+    desc = np.sort(values)[::-1]
+    return np.searchsorted(-desc, -values, side="left") + 1
+
+
+def top_shows(archive: Archive, metric: str = "total", n: int = 20, year=None, seasons=None):
+    """metric（total / average / max / episodes）で作品を並べて上位 n 件を返す"""
+    uniq, total, count, peak = group_by_anime(archive, archive.mask(year, seasons))
+    score = {
+        "total": total,
+        "average": total / np.maximum(count, 1),
+        "max": peak,
+        "episodes": count,
+    }[metric]
+    order = np.argsort(-score, kind="stable")[:n]
+    ranks = competition_rank(score)
+    return [
+        {
+            "rank": int(ranks[i]),
+            "id": int(uniq[i]),
+            "name_jp": archive.names.get(int(uniq[i]), ""),
+            "total": int(total[i]),
+            "episodes": int(count[i]),
+            "average": round(float(total[i] / max(count[i], 1)), 1),
+            "max": int(peak[i]),
+        }
+        for i in order
+    ]
+
+
+def season_percentiles(archive: Archive, q=(50, 90, 99)):
+    """シーズンごとのエピソード単位コメント数のパーセンタイル"""
+    rows = []
+    for s_idx, key in enumerate(archive.seasons):
+        values = archive.comments[archive.season == s_idx]
+        if len(values) == 0:
+            continue
+        pct = np.percentile(values, q)
+        rows.append({
+            "season": key,
+            "episodes": int(len(values)),
+            "mean": round(float(values.mean()), 1),
+            **{f"p{p:g}": round(float(v), 1) for p, v in zip(q, pct)},
+        })
+    return rows
+
+
+def rank_changes(archive: Archive, season: str, offset: int = 1):
+    """
+    シーズン内の週ごとの順位変動。
+    各作品の最新話と offset 話前（前週）のコメント数でそれぞれ順位をつけ、その差を返す
+    （フロントの「ランキング推移」と同じく、最新話からの相対話数で比較する）。
+    両方の話がある作品だけを対象にし、2 つの順位は同じ作品集合の中でつける。
+    """
+    s_idx = archive.seasons.index(season)
+    m = archive.season == s_idx
+    ids, eps, comments = archive.anime_id[m], archive.episode[m], archive.comments[m]
+
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    latest = np.zeros(len(uniq), dtype=np.int32)
+    np.maximum.at(latest, inverse, eps)
+    rel = latest[inverse] - eps  # 0 = 最新話, 1 = 前話 ...
+
+    def counts_at(k):
+        out = np.full(len(uniq), -1, dtype=np.int64)  # -1 = その話の投稿なし
+        sel = rel == k
+        out[inverse[sel]] = comments[sel]
+        return out
+
+    now, before = counts_at(0), counts_at(offset)
+    valid = np.flatnonzero((now >= 0) & (before >= 0))
+    uniq, latest, now, before = uniq[valid], latest[valid], now[valid], before[valid]
+    rank_now, rank_before = competition_rank(now), competition_rank(before)
+
+    rows = []
+    for i in np.argsort(rank_now, kind="stable"):
+        rows.append({
+            "id": int(uniq[i]),
+            "name_jp": archive.names.get(int(uniq[i]), ""),
+            "episode": int(latest[i]),
+            "comments": int(now[i]),
+            "rank": int(rank_now[i]),
+            "prev_rank": int(rank_before[i]),
+            "change": int(rank_before[i] - rank_now[i]),  # 正 = 上昇
+        })
+    return rows
+
+
+# ========================
+# CLI
+# ========================
+def _print_table(rows):
+    if not rows:
+        print("(no rows)")
+        return
+    cols = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cross-season analytics over data/reddit")
+    parser.add_argument("--src", default="data/reddit")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_top = sub.add_parser("top", help="top shows by total / average / max comments")
+    p_top.add_argument("--metric", choices=["total", "average", "max", "episodes"], default="total")
+    p_top.add_argument("--year", type=int)
+    p_top.add_argument("--season", action="append", help="season key (repeatable)")
+    p_top.add_argument("-n", type=int, default=20)
+
+    p_pct = sub.add_parser("percentiles", help="per-season comment count percentiles")
+    p_pct.add_argument("--q", type=float, nargs="+", default=[50, 90, 99])
+
+    p_rank = sub.add_parser("ranks", help="week-over-week rank changes within a season")
+    p_rank.add_argument("--season", help="season key (default: latest)")
+    p_rank.add_argument("--offset", type=int, default=1)
+
+    args = parser.parse_args()
+    archive = load_archive(args.src)
+
+    # シーズンキーは読み込んだアーカイブに対して検証する
+    if args.command == "ranks" and not archive.seasons:
+        parser.error(f"no season files found in {args.src}")
+    if args.command == "ranks" and args.season is not None and args.season not in archive.seasons:
+        parser.error(f"unknown season {args.season!r} (available: {', '.join(archive.seasons)})")
+
+    if args.command == "top":
+        for key in args.season or []:
+            if key not in archive.seasons:
+                print(f"warning: unknown season {key!r} ignored", file=sys.stderr)
+        rows = top_shows(archive, args.metric, args.n, year=args.year, seasons=args.season)
+    elif args.command == "percentiles":
+        rows = season_percentiles(archive, args.q)
+    else:
+        rows = rank_changes(archive, args.season or archive.seasons[-1], args.offset)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        _print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import hashlib
+import json
+import os
+
+# シーズンファイルの変更検知:
+# 各ステージ（アーカイブ・コメント数更新・クリーンアップ）が触ったシーズンファイルの
+# 更新前後のハッシュを data/changes.json に書き出す。内容が変わったシーズンだけが載るので、
+# seasons.json の生成・astro への書き出し・コミット・デプロイは変更がなければ省略できる。
+#
+# {
+#   "stage": "archive",
+#   "changed": {
+#     "2026_3_summer": {"before": "<sha256>", "after": "<sha256>"}
+#   }
+# }
+# before が null ならシーズンファイルの新規作成、after が null なら削除。
+
+CHANGES_PATH = "data/changes.json"
+
+
+def file_hash(path: str):
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ChangeTracker:
+    """触る前のシーズンファイルのハッシュを覚えておき、終了時に変わったものだけを書き出す"""
+
+    def __init__(self, stage: str, src_dir: str = "data/reddit", path: str = CHANGES_PATH):
+        self.stage = stage
+        self.src_dir = src_dir
+        self.path = path
+        self.before = {}
+
+    def season_path(self, key: str) -> str:
+        return os.path.join(self.src_dir, f"{key}.json")
+
+    def touch(self, key: str):
+        """シーズンファイルを書き換える前に呼ぶ（同じキーは最初の 1 回だけ記録）"""
+        if key not in self.before:
+            self.before[key] = file_hash(self.season_path(key))
+
+    def finish(self) -> dict:
+        changed = {}
+        for key, before in sorted(self.before.items()):
+            after = file_hash(self.season_path(key))
+            if after != before:
+                changed[key] = {"before": before, "after": after}
+
+        dirp = os.path.dirname(self.path)
+        if dirp:
+            os.makedirs(dirp, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"stage": self.stage, "changed": changed}, f, ensure_ascii=False, indent=2)
+        return changed
+
+
+def load_changes(path: str = CHANGES_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="show seasons changed by the last pipeline stage")
+    parser.add_argument("--path", default=CHANGES_PATH)
+    parser.add_argument("--github-output", action="store_true",
+                        help="append changed=true|false and seasons=... to $GITHUB_OUTPUT")
+    args = parser.parse_args()
+
+    manifest = load_changes(args.path)
+    # マニフェストがない場合は変更ありとして扱う（判断できないので処理を省略しない）
+    seasons = sorted(manifest["changed"]) if manifest is not None else []
+    changed = manifest is None or bool(seasons)
+    print(f"changed={'true' if changed else 'false'} seasons={','.join(seasons)}")
+
+    if args.github_output and os.getenv("GITHUB_OUTPUT"):
+        with open(os.environ["GITHUB_OUTPUT"], "a", encoding="utf-8") as f:
+            f.write(f"changed={'true' if changed else 'false'}\n")
+            f.write(f"seasons={','.join(seasons)}\n")
+
+
+if __name__ == "__main__":
+    main()
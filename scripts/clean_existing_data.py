@@ -1,7 +1,11 @@
 import json
 import os
 import glob
-import shutil
+
+from change_manifest import ChangeTracker
+from export_shards import publish
+from records import ArchivedPost, dump_json, load_json
+from reddit_archiver import rebuild_post_index
 
 # 管理用スクリプト: 既存のRedditアーカイブデータをクリーンアップし、無効なエントリを削除する
 
@@ -12,7 +16,7 @@ def clean_season_file(filepath: str) -> dict:
     """
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            data = load_json(f, ArchivedPost)
     except (FileNotFoundError, json.JSONDecodeError):
         return {"error": f"Could not read or parse {filepath}"}
 
@@ -40,7 +44,7 @@ def clean_season_file(filepath: str) -> dict:
             # Keep only posts that contain "discussion"
             posts_to_keep = [
                 post for post in posts 
-                if "discussion" in post.get("reddit_title", "").lower()
+                if "discussion" in post.reddit_title.lower()
             ]
             
             # If the list has changed, update it
@@ -67,7 +71,7 @@ def clean_season_file(filepath: str) -> dict:
     # Save the cleaned data back to the file
     if cleaned_count > 0 or anime_to_remove:
         with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            dump_json(data, f)
 
     return {"cleaned_posts": cleaned_count, "removed_anime": len(anime_to_remove)}
 
@@ -80,6 +84,7 @@ def main():
     
     total_cleaned_posts = 0
     total_removed_anime = 0
+    tracker = ChangeTracker("clean")
     
     print(f"Found {len(season_files)} season files to clean in data/reddit/...")
 
@@ -87,6 +92,7 @@ def main():
         if os.path.basename(filepath) == 'seasons.json': # Don't process seasons.json
             continue
         print(f"Cleaning {filepath}...")
+        tracker.touch(os.path.splitext(os.path.basename(filepath))[0])
         summary = clean_season_file(filepath)
         if "error" in summary:
             print(f"  Error: {summary['error']}")
@@ -102,14 +108,18 @@ def main():
     print(f"Total posts removed: {total_cleaned_posts}")
     print(f"Total anime entries removed: {total_removed_anime}")
 
+    # Record which seasons actually changed in data/changes.json
+    changed = tracker.finish()
+    print(f"Changed seasons: {', '.join(changed) or 'none'}")
+
+    # Removed posts must also leave the archived-post index
+    posts = rebuild_post_index()
+    print(f"Rebuilt archived-post index ({len(posts)} posts).")
+
     # Copy the cleaned data to the astro public directory
     print("\nCopying cleaned data to astro/public/data/reddit...")
     try:
-        shutil.copytree(
-            "./data/reddit",
-            "./astro/public/data/reddit",
-            dirs_exist_ok=True
-        )
+        publish()
         print("Copy successful.")
     except Exception as e:
         print(f"Error during copy: {e}")
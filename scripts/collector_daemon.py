@@ -0,0 +1,157 @@
+"""
+常駐モードのコレクター。
+
+GitHub Actions の日次ジョブでは実行のたびに Python の起動・praw.Reddit の作成・
+AniList インデックスの構築をやり直している。このスクリプトはそれらを 1 プロセス内で
+保持したまま、以下のジョブを指定間隔で繰り返し実行する。
+
+  - listing : r/anime の新着を取得 → 事前フィルタ → マッチング → アーカイブ（デフォルト 10 分ごと）
+  - refresh : 直近シーズンのコメント数を更新（デフォルト 6 時間ごと）。1 パスは数百件 × 1.5 秒かかるので、
+              REFRESH_SLICE 件ずつに分けて REFRESH_TICK ごとに進め、その間も listing を止めない
+  - anilist : AniList のタイトル一覧を再取得してインデックスを作り直す（デフォルト 24 時間ごと）
+
+使い方:
+  python scripts/collector_daemon.py --listing-interval 600 --refresh-interval 21600
+
+データは data/ と astro/public/data/reddit に書き出すだけなので、
+コミットやデプロイは別途行うこと。
+"""
+import argparse
+import shutil
+import subprocess
+import time
+import traceback
+from datetime import datetime
+
+from export_shards import publish
+from fetch_anilist import get_current_season_anime
+from fetch_r_anime import build_snapshot, create_reddit, pull_listing, save_snapshot
+from match_titles import load_anime_index, match_posts, save_matched_results
+from prefilter import prefilter_posts
+from reddit_archiver import archive_reddit_latest
+from update_existing import update_seasons
+
+LISTING_INTERVAL = 10 * 60        # 新着取得の間隔（秒）
+REFRESH_INTERVAL = 6 * 60 * 60    # コメント数更新の間隔（秒）
+ANILIST_INTERVAL = 24 * 60 * 60   # AniList 再取得の間隔（秒）
+REFRESH_TICK = 60                 # コメント数更新を途中まで進める間隔（秒）
+REFRESH_SLICE = 40                # 1 回に取得するコメント数の件数（1.5 秒 × 40 = 約 1 分）
+LISTING_LIMIT = 100               # 1 回の新着取得で読む件数（10 分間の投稿数には十分）
+
+
+def log(*args):
+    print(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), *args, flush=True)
+
+
+class Collector:
+    """Reddit クライアントと AniList インデックスを保持して各ジョブを実行する"""
+
+    def __init__(self, listing_types=("new",), listing_limit=LISTING_LIMIT,
+                 refresh_interval=REFRESH_INTERVAL, refresh_slice=REFRESH_SLICE):
+        self.reddit = create_reddit()
+        self.listing_types = listing_types
+        self.listing_limit = listing_limit
+        self.refresh_interval = refresh_interval
+        self.refresh_slice = refresh_slice
+        self.next_refresh_pass = time.monotonic()  # 次のコメント数更新パスを始める時刻
+        self.anime_index, self.token_usage, self.ngram_index = load_anime_index()
+
+    def refresh_anilist(self):
+        titles = get_current_season_anime()
+        # anilist.json が変わっていればここでインデックスが作り直される
+        self.anime_index, self.token_usage, self.ngram_index = load_anime_index()
+        log(f"anilist: {len(titles)} titles, index has {len(self.anime_index)} entries")
+
+    def collect_listing(self):
+        listings = {
+            list_type: pull_listing(self.reddit, list_type, limit=self.listing_limit, delay=0)
+            for list_type in self.listing_types
+        }
+        snapshot = build_snapshot(listings)
+        save_snapshot(snapshot)
+
+        candidates = prefilter_posts(snapshot["posts"])
+        results = match_posts(candidates, self.anime_index, self.token_usage, self.ngram_index)
+        save_matched_results(results)
+
+        summary = archive_reddit_latest()
+        log(f"listing: {len(snapshot['posts'])} posts, {len(results)} matched, archive {summary}")
+        if summary["archived"]:
+            generate_seasons()
+
+    def refresh_comments(self):
+        # パスの途中ならチェックポイントから refresh_slice 件だけ進める。
+        # パスが終わった（または 403 で中断した）ら refresh_interval 後まで次のパスを始めない
+        if time.monotonic() < self.next_refresh_pass:
+            return
+        summary = update_seasons(self.reddit, max_posts=self.refresh_slice)
+        if summary["changed"]:
+            publish(seasons=summary["changed"])
+        log(f"refresh: {summary}")
+        if summary["completed"] or summary["aborted"]:
+            self.next_refresh_pass = time.monotonic() + self.refresh_interval
+
+
+def generate_seasons():
+    # 新しいシーズンファイルが増えた場合に備えて seasons.json を作り直す
+    if shutil.which("node") is None:
+        log("warn: node not found, seasons.json not regenerated")
+        return
+    subprocess.run(["node", "tools/generate-seasons.mjs"], check=False)
+
+
+def run_forever(jobs):
+    """
+    jobs: [(name, interval_seconds, func), ...]
+    各ジョブを起動直後に 1 回実行し、その後は interval ごとに実行する。
+    ジョブ内の例外はログに出して次回に持ち越す（デーモン自体は止めない）。
+    """
+    next_run = {name: time.monotonic() for name, _, _ in jobs}
+    while True:
+        for name, interval, func in jobs:
+            if time.monotonic() < next_run[name]:
+                continue
+            try:
+                func()
+            except Exception:
+                log(f"error in {name} job")
+                traceback.print_exc()
+            next_run[name] = time.monotonic() + interval
+
+        wait = min(next_run.values()) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="r/anime collector daemon")
+    parser.add_argument("--listing-interval", type=int, default=LISTING_INTERVAL,
+                        help="seconds between listing pulls (default: %(default)s)")
+    parser.add_argument("--refresh-interval", type=int, default=REFRESH_INTERVAL,
+                        help="seconds between comment count refreshes (default: %(default)s)")
+    parser.add_argument("--refresh-slice", type=int, default=REFRESH_SLICE,
+                        help="posts to refresh per tick while a refresh pass is running (default: %(default)s)")
+    parser.add_argument("--anilist-interval", type=int, default=ANILIST_INTERVAL,
+                        help="seconds between AniList refetches (default: %(default)s)")
+    parser.add_argument("--listing-limit", type=int, default=LISTING_LIMIT,
+                        help="posts to read per listing pull (default: %(default)s)")
+    parser.add_argument("--listing-types", default="new",
+                        help="comma separated listing types: hot,new,top (default: %(default)s)")
+    args = parser.parse_args()
+
+    collector = Collector(
+        listing_types=tuple(t.strip() for t in args.listing_types.split(",") if t.strip()),
+        listing_limit=args.listing_limit,
+        refresh_interval=args.refresh_interval,
+        refresh_slice=args.refresh_slice,
+    )
+    log("collector daemon started")
+    run_forever([
+        ("anilist", args.anilist_interval, collector.refresh_anilist),
+        ("listing", args.listing_interval, collector.collect_listing),
+        ("refresh", REFRESH_TICK, collector.refresh_comments),
+    ])
+
+
+if __name__ == "__main__":
+    main()
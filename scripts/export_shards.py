@@ -0,0 +1,132 @@
+import glob
+import os
+import shutil
+
+from records import ArchivedPost, dumps_json, load_json
+
+# フロントエンド向けの書き出し:
+#   astro/public/data/reddit/<season>.json                 シーズン全体（ランキング推移用）
+#   astro/public/data/reddit/<season>/manifest.json        作品一覧とランキング用の集計値
+#   astro/public/data/reddit/<season>/anime/<anilist_id>.json  作品ごとのエピソード一覧
+# ページはマニフェストだけでランキング表を描画し、作品を開いたときだけシャードを読む。
+
+SRC_DIR = "data/reddit"
+OUT_DIR = "astro/public/data/reddit"
+
+
+def _dump(data) -> str:
+    return dumps_json(data)
+
+
+def _write_if_changed(path: str, text: str) -> bool:
+    """内容が同じなら書き込まない（不要な差分・コミットを避ける）"""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    dirp = os.path.dirname(path)
+    if dirp:
+        os.makedirs(dirp, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def _first_post(anime: dict, ep):
+    if ep is None:
+        return None
+    posts = (anime.get("episodes") or {}).get(str(ep))
+    return posts[0] if posts else None
+
+
+def manifest_entry(anime: dict) -> dict:
+    """1作品分のマニフェスト行。ランキング表（最新話/前話/合計/平均）はこれだけで描画できる"""
+    latest = anime.get("latest_episode")
+    latest_post = _first_post(anime, latest)
+    prev_post = _first_post(anime, latest - 1) if latest else None
+
+    total = 0
+    episode_count = 0
+    for posts in (anime.get("episodes") or {}).values():
+        for post in posts:
+            total += post.num_comments or 0
+            episode_count += 1
+
+    return {
+        "id": anime.get("id"),
+        "name_jp": anime.get("name_jp"),
+        "latest_episode": latest,
+        "latest_comments": (latest_post.num_comments or 0) if latest_post else None,
+        "latest_url": latest_post.url if latest_post else None,
+        "previous_comments": (prev_post.num_comments or 0) if prev_post else None,
+        "previous_url": prev_post.url if prev_post else None,
+        "total_comments": total,
+        "episode_count": episode_count,
+    }
+
+
+def export_season(src_path: str, out_dir: str = OUT_DIR) -> dict:
+    """1シーズン分のマニフェストとシャードを書き出す"""
+    key = os.path.splitext(os.path.basename(src_path))[0]
+    with open(src_path, "r", encoding="utf-8") as f:
+        data = load_json(f, ArchivedPost)
+
+    season_dir = os.path.join(out_dir, key)
+    shard_dir = os.path.join(season_dir, "anime")
+    # フロントの Object.values と同じく ID の数値順に並べる（グラフの色を揃えるため）
+    anime_items = sorted((data.get("anime") or {}).items(), key=lambda kv: int(kv[0]))
+
+    written = 0
+    for anime_id, anime in anime_items:
+        if _write_if_changed(os.path.join(shard_dir, f"{anime_id}.json"), _dump(anime)):
+            written += 1
+
+    # 削除された作品のシャードを消す
+    removed = 0
+    keep = {f"{anime_id}.json" for anime_id, _ in anime_items}
+    for path in glob.glob(os.path.join(shard_dir, "*.json")):
+        if os.path.basename(path) not in keep:
+            os.remove(path)
+            removed += 1
+
+    manifest = {
+        "metadata": data.get("metadata"),
+        "anime": [manifest_entry(anime) for _, anime in anime_items],
+    }
+    _write_if_changed(os.path.join(season_dir, "manifest.json"), _dump(manifest))
+
+    return {"season": key, "anime": len(anime_items), "shards_written": written, "shards_removed": removed}
+
+
+def export_shards(src_dir: str = SRC_DIR, out_dir: str = OUT_DIR) -> list[dict]:
+    summaries = []
+    for src_path in sorted(glob.glob(os.path.join(src_dir, "*.json"))):
+        if os.path.basename(src_path) == "seasons.json":
+            continue
+        summaries.append(export_season(src_path, out_dir))
+    return summaries
+
+
+def publish(src_dir: str = SRC_DIR, out_dir: str = OUT_DIR, seasons=None) -> list[dict]:
+    """
+    data/reddit を astro/public/data/reddit にコピーし、マニフェストとシャードを更新する。
+    seasons（シーズンキーのリスト）を渡すとそのシーズンだけを書き出す。
+    """
+    if seasons is None:
+        shutil.copytree(src_dir, out_dir, dirs_exist_ok=True)
+        return export_shards(src_dir, out_dir)
+
+    summaries = []
+    os.makedirs(out_dir, exist_ok=True)
+    for key in seasons:
+        src_path = os.path.join(src_dir, f"{key}.json")
+        if not os.path.exists(src_path):
+            continue
+        shutil.copy2(src_path, os.path.join(out_dir, f"{key}.json"))
+        summaries.append(export_season(src_path, out_dir))
+    return summaries
+
+
+if __name__ == "__main__":
+    for s in publish():
+        print(s)
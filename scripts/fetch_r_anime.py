@@ -1,35 +1,38 @@
 # fetch_r_anime.py
 import os
 import time
-import json
 from datetime import datetime, timezone
 import praw
 
-# 環境変数から取得
-CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
-CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
-USERNAME = os.getenv("REDDIT_USERNAME")
-PASSWORD = os.getenv("REDDIT_PASSWORD")
-USER_AGENT = os.getenv("REDDIT_USER_AGENT", "r-anime-scraper/0.1 by example")
-
-if not all([CLIENT_ID, CLIENT_SECRET, USERNAME, PASSWORD]):
-    raise SystemExit("Missing Reddit credentials in environment variables.")
-
-reddit = praw.Reddit(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    username=USERNAME,
-    password=PASSWORD,
-    user_agent=USER_AGENT,
-    check_for_updates=False,
-    ratelimit_seconds=60
-)
+from records import RedditPost, dump_json
 
 SUB = "anime"
 MAX_PER_LIST = 800  # hot/new で取る数。1000がAPI上の深さ制限に近いので余裕を持たせる
 
-def pull_listing(list_type="hot", limit=MAX_PER_LIST):
-    """hot or new listing を取得して dict のリストで返す"""
+def create_reddit():
+    """環境変数の認証情報から praw.Reddit クライアントを作成する"""
+    # 環境変数から取得
+    client_id = os.getenv("REDDIT_CLIENT_ID")
+    client_secret = os.getenv("REDDIT_CLIENT_SECRET")
+    username = os.getenv("REDDIT_USERNAME")
+    password = os.getenv("REDDIT_PASSWORD")
+    user_agent = os.getenv("REDDIT_USER_AGENT", "r-anime-scraper/0.1 by example")
+
+    if not all([client_id, client_secret, username, password]):
+        raise SystemExit("Missing Reddit credentials in environment variables.")
+
+    return praw.Reddit(
+        client_id=client_id,
+        client_secret=client_secret,
+        username=username,
+        password=password,
+        user_agent=user_agent,
+        check_for_updates=False,
+        ratelimit_seconds=60
+    )
+
+def pull_listing(reddit, list_type="hot", limit=MAX_PER_LIST, delay=1):
+    """hot or new listing を取得して RedditPost のリストで返す"""
     subreddit = reddit.subreddit(SUB)
     if list_type == "hot":
         gen = subreddit.hot(limit=limit)
@@ -42,22 +45,11 @@ def pull_listing(list_type="hot", limit=MAX_PER_LIST):
     items = []
     for post in gen:
         try:
-            items.append({
-                "id": post.id,
-                "title": post.title,
-                "score": post.score,
-                "num_comments": post.num_comments,
-                "created_utc": int(post.created_utc),
-                "author": str(post.author) if post.author else None,
-                "permalink": post.permalink,
-                "url": post.url,
-                "is_self": post.is_self,
-                "flair": post.link_flair_text,
-            })
+            items.append(RedditPost.from_praw(post))
         except Exception as e:
             # 取得で稀にエラー出ることがあるので無理せずスキップ
             print("warn: skipping post due to", e)
-        time.sleep(1)  # API負荷を下げるためにわずかに待つ
+        time.sleep(delay)  # API負荷を下げるためにわずかに待つ
     return items
 
 def merge_unique(list_of_lists):
@@ -65,41 +57,44 @@ def merge_unique(list_of_lists):
     merged = []
     for lst in list_of_lists:
         for item in lst:
-            if item["id"] not in seen:
-                seen[item["id"]] = True
+            if item.id not in seen:
+                seen[item.id] = True
                 merged.append(item)
     return merged
 
-def main():
+def build_snapshot(listings):
+    """{list_type: [RedditPost, ...]} から reddit_latest.json 形式の dict を作る（posts は RedditPost のまま）"""
     now = datetime.now(timezone.utc)
-    date_str = now.strftime("%Y-%m-%dT%H%M%SZ")
-    # 取得：hot と new を両方取ってユニーク化
-    hot = pull_listing("hot")
-    new = pull_listing("new")
-    top_day = pull_listing("top")
-    merged = merge_unique([hot, new, top_day])
-
-    out = {
-        "snapshot_at": date_str,
+    merged = merge_unique(listings.values())
+    counts = {f"{list_type}_count": len(items) for list_type, items in listings.items()}
+    counts["merged_count"] = len(merged)
+    return {
+        "snapshot_at": now.strftime("%Y-%m-%dT%H%M%SZ"),
         "source_subreddit": SUB,
-        "counts": {
-            "hot_count": len(hot),
-            "new_count": len(new),
-            "top_count": len(top_day),
-            "merged_count": len(merged),
-        },
+        "counts": counts,
         "posts": merged
     }
 
-    os.makedirs("data", exist_ok=True)
+def save_snapshot(out, path="data/reddit_latest.json"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        dump_json(out, f)
+
+def main():
+    reddit = create_reddit()
+    # 取得：hot と new を両方取ってユニーク化
+    hot = pull_listing(reddit, "hot")
+    new = pull_listing(reddit, "new")
+    top_day = pull_listing(reddit, "top")
+    out = build_snapshot({"hot": hot, "new": new, "top": top_day})
+    merged = out["posts"]
+
     # Test mode: skip writing full dated snapshot to avoid creating many files in tests
-    # filename = f"data/r_anime_snapshot_{now.strftime('%Y%m%d')}.json"
-    # with open(filename, "w", encoding="utf-8") as f:
-    #     json.dump(out, f, ensure_ascii=False, indent=2)
+    # filename = f"data/r_anime_snapshot_{out['snapshot_at'][:10].replace('-', '')}.json"
+    # save_snapshot(out, filename)
 
     # reddit_latest.json を上書き（Pages 側で常に最新を参照する用）
-    with open("data/reddit_latest.json", "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    save_snapshot(out)
 
     print(f"Updated data/reddit_latest.json (total {len(merged)} posts). Snapshot file creation skipped in test mode.")
 
@@ -1,7 +1,12 @@
+import hashlib
 import json
+import os
+import pickle
 import re
 from collections import defaultdict
-from rapidfuzz import fuzz
+
+from prefilter import prefilter_posts
+from records import MatchResult, RedditPost, dump_json, load_json
 
 # ========================
 # 設定値
@@ -10,6 +15,16 @@ FUZZY_THRESHOLD = 80
 MIN_TOKEN_MATCH = 2
 # If fuzzy score is >= this, allow match even when token overlap < MIN_TOKEN_MATCH
 HIGH_FUZZY_OVERRIDE = 85
+# 日本語（CJK）タイトルの候補絞り込み: 文字 n-gram の長さと最低一致数
+NGRAM_SIZE = 2
+MIN_NGRAM_MATCH = 2
+
+ANILIST_PATH = "data/anilist.json"
+# build_anime_index の結果をキャッシュするバイナリファイル（anilist.json のハッシュで無効化）
+INDEX_CACHE_PATH = "data/anilist_index.pkl"
+# インデックスの構造を変えたら上げる（古いキャッシュを読み込まないため）
+# .github/workflows/fetch_r_anime.yml のキャッシュキー（anilist-index-vN）も合わせて変えること
+INDEX_FORMAT_VERSION = 3
 
 STOPWORDS = {
     "the", "a", "an", "of", "to", "and", "or", "in", "on",
@@ -17,6 +32,10 @@ STOPWORDS = {
     "new", "visual", "trailer", "pv"
 }
 
+# ひらがな・カタカナ・CJK統合漢字（拡張A・互換含む）・半角カナ
+CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f]+")
+LATIN_RE = re.compile(r"[A-Za-z\uff21-\uff3a\uff41-\uff5a]")  # 全角英字も含む
+
 # ========================
 # ユーティリティ
 # ========================
@@ -34,6 +53,27 @@ def tokenize(text: str) -> set[str]:
     }
 
 
+def has_cjk(text: str) -> bool:
+    return CJK_RE.search(text or "") is not None
+
+
+def has_latin(text: str) -> bool:
+    return LATIN_RE.search(text or "") is not None
+
+
+def cjk_ngrams(text: str, n: int = NGRAM_SIZE) -> set[str]:
+    """
+    CJK 文字の連続部分から文字 n-gram を作る。
+    \w で区切る tokenize では日本語タイトルが 1 つの巨大なトークンになり、
+    他のタイトルと一致しないため、こちらで候補を絞り込む。
+    """
+    grams = set()
+    for run in CJK_RE.findall(normalize(text)):
+        for i in range(len(run) - n + 1):
+            grams.add(run[i:i + n])
+    return grams
+
+
 # ========================
 # AniListタイトル整理
 # ========================
@@ -53,8 +93,10 @@ def build_anime_index(anime_list):
         ]))
 
         all_tokens = set()
+        all_ngrams = set()
         for title in aliases:
             all_tokens |= tokenize(title)
+            all_ngrams |= cjk_ngrams(title)
 
         for t in all_tokens:
             token_usage[t] += 1
@@ -63,35 +105,131 @@ def build_anime_index(anime_list):
             "id": a.get("id"),                 # AniList ID を保持
             "native": a.get("native"),         # 出力用
             "aliases": list(aliases),          # マッチ用
+            "normalized": [normalize(t) for t in aliases],  # マッチ用（正規化済み）
+            # 英語タイトル用（英字を含まない alias は英語タイトルとは一致しないので除く。
+            # 「攻殻機動隊 THE GHOST IN THE SHELL」のような英字混じりの native は残す）
+            "latin_normalized": [normalize(t) for t in aliases if has_latin(t)],
             "tokens": all_tokens,
+            "ngrams": all_ngrams,              # 日本語タイトルの候補絞り込み用
             "seasonYear": a.get("seasonYear"), # 追加: 年度
             "season": a.get("season"),         # 追加: 季節 (WINTER/SPRING/SUMMER/FALL)
         })
 
-    return index, token_usage
+    return index, dict(token_usage)
+
+
+def build_ngram_index(anime_index) -> dict[str, list[int]]:
+    """n-gram -> anime_index 内の位置のリスト（転置インデックス）"""
+    ngram_index = defaultdict(list)
+    for pos, anime in enumerate(anime_index):
+        for g in anime["ngrams"]:
+            ngram_index[g].append(pos)
+    return dict(ngram_index)
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_anime_index(anilist_path: str = ANILIST_PATH, cache_path: str | None = INDEX_CACHE_PATH):
+    """
+    build_anime_index / build_ngram_index の結果をキャッシュから読み込む。
+    anilist.json の内容が変わっていればインデックスを作り直してキャッシュを更新する。
+    """
+    try:
+        source_hash = _file_hash(anilist_path)
+    except FileNotFoundError:
+        raise RuntimeError(f"{anilist_path} not found. Run fetch_anilist.py to create it.")
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if (cached.get("version") == INDEX_FORMAT_VERSION
+                    and cached.get("source_hash") == source_hash):
+                return cached["index"], cached["token_usage"], cached["ngram_index"]
+        except Exception as e:
+            # 壊れたキャッシュは作り直す
+            print("warn: ignoring broken index cache due to", e)
+
+    with open(anilist_path, encoding="utf-8") as f:
+        anime_list = json.load(f)
+    index, token_usage = build_anime_index(anime_list)
+    ngram_index = build_ngram_index(index)
+
+    if cache_path:
+        dirp = os.path.dirname(cache_path)
+        if dirp:
+            os.makedirs(dirp, exist_ok=True)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({
+                "version": INDEX_FORMAT_VERSION,
+                "source_hash": source_hash,
+                "index": index,
+                "token_usage": token_usage,
+                "ngram_index": ngram_index,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+
+    return index, token_usage, ngram_index
 
 
 # ========================
 # マッチ判定
 # ========================
-def match_title(reddit_title, anime_index, token_usage):
+def _min_ngram_match(anime) -> int:
+    # 「銀魂」のように n-gram が 1 個しかない作品は、その 1 個の一致で候補にする
+    return max(1, min(MIN_NGRAM_MATCH, len(anime["ngrams"])))
+
+
+def cjk_candidates(reddit_title, anime_index, ngram_index=None):
+    """日本語タイトルと n-gram が MIN_NGRAM_MATCH 個（作品側がそれより少なければその数）以上一致する作品だけを返す"""
+    r_ngrams = cjk_ngrams(reddit_title)
+    if ngram_index is None:
+        return [a for a in anime_index if len(r_ngrams & a["ngrams"]) >= _min_ngram_match(a)]
+
+    counts = defaultdict(int)
+    for g in r_ngrams:
+        for pos in ngram_index.get(g, ()):
+            counts[pos] += 1
+    return [anime_index[pos] for pos, c in sorted(counts.items()) if c >= _min_ngram_match(anime_index[pos])]
+
+
+def match_title(reddit_title, anime_index, token_usage, ngram_index=None):
+    # rapidfuzz の import はインデックス読み込み後まで遅らせる
+    from rapidfuzz import fuzz
+
     r_tokens = tokenize(reddit_title)
+    r_normalized = normalize(reddit_title)
+
+    # 日本語タイトルは n-gram で候補を絞ってから全 alias と比較する
+    # 候補がなければ英語タイトルと同じ総当たりに戻す
+    title_has_cjk = has_cjk(reddit_title)
+    candidates = cjk_candidates(reddit_title, anime_index, ngram_index) if title_has_cjk else []
+    cjk = bool(candidates)
+    if not cjk:
+        candidates = anime_index
+    # 総当たりでも、タイトルに日本語が含まれていれば native を含む全 alias と比較する
+    alias_key = "normalized" if title_has_cjk else "latin_normalized"
 
     best = None
     best_score = 0
 
-    for anime in anime_index:
+    for anime in candidates:
         shared = r_tokens & anime["tokens"]
 
         # --- 1単語マッチ制限 ---
-        low_token_overlap = len(shared) < MIN_TOKEN_MATCH
+        # n-gram で絞り込んだ候補は一致数を確認済みなので制限しない
+        low_token_overlap = not cjk and len(shared) < MIN_TOKEN_MATCH
 
         # --- ファジーマッチ（タイトル全体） ---
-        for alias in anime["aliases"]:
-            score = fuzz.partial_ratio(
-                normalize(reddit_title),
-                normalize(alias)
-            )
+        for alias in anime[alias_key]:
+            score = fuzz.partial_ratio(r_normalized, alias)
 
             # If tokens are few, require a high fuzzy score to override
             if low_token_overlap:
@@ -110,54 +248,54 @@ def match_title(reddit_title, anime_index, token_usage):
                 best_score = score
 
     if best and best_score >= FUZZY_THRESHOLD:
-        # best は dict (id, native, aliases, tokens, seasonYear, season)
+        # best は dict (id, native, aliases, normalized, latin_normalized, tokens, ngrams, seasonYear, season)
         return best, best_score
 
     return None, None
 
 
+def match_posts(reddit_posts, anime_index, token_usage, ngram_index=None):
+    """RedditPost のリストをマッチングし、MatchResult のリストを返す"""
+    results = []
+
+    for post in reddit_posts:
+        matched, score = match_title(post.title, anime_index, token_usage, ngram_index)
+        if not matched:
+            continue
+
+        results.append(MatchResult.from_match(post, matched, score))
+
+    return results
+
+
+def save_matched_results(results, path="data/matched_results.json"):
+    with open(path, "w", encoding="utf-8") as f:
+        dump_json(results, f)
+
+
 # ========================
 # メイン処理
 # ========================
 def main():
-    # Load AniList data from local cache created by `fetch_anilist.py`.
-    try:
-        with open("data/anilist.json", encoding="utf-8") as f:
-            anime_list = json.load(f)
-    except FileNotFoundError:
-        raise RuntimeError("data/anilist.json not found. Run fetch_anilist.py to create it.")
+    # Load AniList index built from the local cache created by `fetch_anilist.py`.
+    # The index is rebuilt only when data/anilist.json changes.
+    anime_index, token_usage, ngram_index = load_anime_index()
 
+    # 投稿は読み込みながら RedditPost に変換する（ファイル全体の文字列や dict は保持しない）
     with open("data/reddit_latest.json", encoding="utf-8") as f:
-        loaded = json.load(f)
-        if isinstance(loaded, dict) and "posts" in loaded:
-            reddit_posts = loaded["posts"]
-        elif isinstance(loaded, list):
-            reddit_posts = loaded
-        else:
-            raise RuntimeError("data/reddit_latest.json has unexpected format; expected list or {'posts': [...]}")
-
-    anime_index, token_usage = build_anime_index(anime_list)
+        loaded = load_json(f, RedditPost)
+    if isinstance(loaded, dict) and "posts" in loaded:
+        reddit_posts = loaded["posts"]
+    elif isinstance(loaded, list):
+        reddit_posts = loaded
+    else:
+        raise RuntimeError("data/reddit_latest.json has unexpected format; expected list or {'posts': [...]}")
 
-    results = []
-
-    for post in reddit_posts:
-        matched, score = match_title(post["title"], anime_index, token_usage)
-        if not matched:
-            continue
-
-        results.append({
-            "reddit_title": post["title"],
-            "matched_anime_id": matched.get("id"),
-            "matched_anime_native": matched.get("native"),
-            "score": score,
-            "num_comments": post.get("num_comments", 0),
-            "url": post.get("url"),
-            "seasonYear": matched.get("seasonYear"),  # 追加
-            "season": matched.get("season"),          # 追加
-        })
+    # エピソード討論スレッドの候補だけをマッチングする
+    reddit_posts = prefilter_posts(reddit_posts)
 
-    with open("data/matched_results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    results = match_posts(reddit_posts, anime_index, token_usage, ngram_index)
+    save_matched_results(results)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,67 @@
+import json
+import os
+from collections import Counter
+
+from reddit_archiver import extract_episode
+
+# ========================
+# 事前フィルタ
+# ========================
+# アーカイブされるのはエピソード討論スレッドだけなので、ファジーマッチの前に
+# flair・投稿者・タイトルの形で候補を絞り込む。判定結果は監査用に PREFILTER_LOG_PATH に書き出す。
+
+# r/anime のエピソード討論スレッドに付く flair
+EPISODE_FLAIRS = {"Episode"}
+# エピソード討論スレッドを自動投稿している bot
+EPISODE_AUTHORS = {"AutoLovepon"}
+# タイトルの形がエピソード討論でも対象外にする flair（リウォッチ企画・定期スレッドなど）
+NON_EPISODE_FLAIRS = {"Rewatch", "Daily", "Weekly", "Contest"}
+
+PREFILTER_LOG_PATH = "data/prefilter_log.json"
+
+
+def classify(post) -> tuple[bool, str]:
+    """RedditPost がエピソード討論スレッドの候補かどうかと、その理由を返す"""
+    if post.flair in EPISODE_FLAIRS:
+        return True, "flair"
+    if post.author in EPISODE_AUTHORS:
+        return True, "author"
+
+    title = post.title or ""
+    # reddit_archiver と同じ条件（"discussion" を含み、話数が取れる）を満たさなければ対象外
+    if "discussion" not in title.lower() or extract_episode(title) is None:
+        return False, "title"
+    if post.flair in NON_EPISODE_FLAIRS:
+        return False, "flair"
+    return True, "title"
+
+
+def prefilter_posts(posts, log_path: str | None = PREFILTER_LOG_PATH):
+    """候補の投稿だけを返す。判定はすべて log_path に記録し、集計を標準出力に出す"""
+    kept = []
+    decisions = []
+    counts = Counter()
+    for post in posts:
+        keep, reason = classify(post)
+        counts[("keep" if keep else "drop", reason)] += 1
+        decisions.append({
+            "id": post.id,
+            "title": post.title,
+            "flair": post.flair,
+            "author": post.author,
+            "keep": keep,
+            "reason": reason,
+        })
+        if keep:
+            kept.append(post)
+
+    if log_path:
+        dirp = os.path.dirname(log_path)
+        if dirp:
+            os.makedirs(dirp, exist_ok=True)
+        with open(log_path, "w", encoding="utf-8") as f:
+            json.dump(decisions, f, ensure_ascii=False, indent=2)
+
+    summary = ", ".join(f"{action}/{reason}={n}" for (action, reason), n in sorted(counts.items()))
+    print(f"prefilter: kept {len(kept)} of {len(posts)} posts ({summary})")
+    return kept
@@ -0,0 +1,320 @@
+"""
+パイプライン共通のレコード型。
+
+各ステージで投稿を 10 個前後のキーを持つ dict のまま受け渡していたのを、
+フィールドの決まった __slots__ 付きのクラスに置き換える（キーの打ち間違いや
+古い形式のキーへのフォールバックを読み込み時の 1 か所にまとめる）。
+
+ファイルの読み書きは load_json / dump_json で行い、形式は従来どおり。
+load_json はファイルを少しずつ読みながら投稿の object をそのままレコードに変換するので、
+ファイル全体の文字列や全件分の dict がレコードと同時にメモリに載ることはない。
+dump_json も書き出しながら 1 件ずつ dict に戻す。
+"""
+import json
+import re
+
+
+class RedditPost:
+    """r/anime の listing から取得した投稿（reddit_latest.json の posts の 1 件）"""
+
+    __slots__ = (
+        "id", "title", "score", "num_comments", "created_utc", "author",
+        "permalink", "url", "is_self", "flair",
+    )
+
+    def __init__(self, id, title, score=None, num_comments=0, created_utc=None, author=None,
+                 permalink=None, url=None, is_self=None, flair=None):
+        self.id = id
+        self.title = title
+        self.score = score
+        self.num_comments = num_comments
+        self.created_utc = created_utc
+        self.author = author
+        self.permalink = permalink
+        self.url = url
+        self.is_self = is_self
+        self.flair = flair
+
+    @staticmethod
+    def is_record(d: dict) -> bool:
+        return "id" in d and "title" in d
+
+    @classmethod
+    def from_praw(cls, post):
+        return cls(
+            id=post.id,
+            title=post.title,
+            score=post.score,
+            num_comments=post.num_comments,
+            created_utc=int(post.created_utc),
+            author=str(post.author) if post.author else None,
+            permalink=post.permalink,
+            url=post.url,
+            is_self=post.is_self,
+            flair=post.link_flair_text,
+        )
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            id=d.get("id"),
+            title=d.get("title") or "",
+            score=d.get("score"),
+            num_comments=d.get("num_comments", 0),
+            created_utc=d.get("created_utc"),
+            author=d.get("author"),
+            permalink=d.get("permalink"),
+            url=d.get("url"),
+            is_self=d.get("is_self"),
+            flair=d.get("flair"),
+        )
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class MatchResult:
+    """
+    match_titles.py の出力（matched_results.json の 1 件）。
+    from_dict で古い形式のキー（title / matched_anime / matched_id / created）も吸収するので、
+    読み込んだ後はフォールバックを気にせず属性を参照できる。
+    """
+
+    __slots__ = (
+        "reddit_title", "matched_anime_id", "matched_anime_native", "score",
+        "num_comments", "url", "seasonYear", "season",
+        # 以下は任意（入力にあれば引き継ぐ）
+        "episode", "reddit_id", "created_utc", "matched_title",
+    )
+    OPTIONAL = ("episode", "reddit_id", "created_utc", "matched_title")
+
+    def __init__(self, reddit_title, matched_anime_id, matched_anime_native=None, score=None,
+                 num_comments=0, url=None, seasonYear=None, season=None,
+                 episode=None, reddit_id=None, created_utc=None, matched_title=None):
+        self.reddit_title = reddit_title
+        self.matched_anime_id = matched_anime_id
+        self.matched_anime_native = matched_anime_native
+        self.score = score
+        self.num_comments = num_comments
+        self.url = url
+        self.seasonYear = seasonYear
+        self.season = season
+        self.episode = episode
+        self.reddit_id = reddit_id
+        self.created_utc = created_utc
+        self.matched_title = matched_title
+
+    @staticmethod
+    def is_record(d: dict) -> bool:
+        return "matched_anime_id" in d or "matched_anime" in d or "matched_id" in d
+
+    @classmethod
+    def from_match(cls, post: RedditPost, anime: dict, score):
+        return cls(
+            reddit_title=post.title,
+            matched_anime_id=anime.get("id"),
+            matched_anime_native=anime.get("native"),
+            score=score,
+            num_comments=post.num_comments,
+            url=post.url,
+            seasonYear=anime.get("seasonYear"),
+            season=anime.get("season"),
+        )
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            reddit_title=d.get("reddit_title") or d.get("title") or "",
+            matched_anime_id=d.get("matched_anime_id") or d.get("matched_anime") or d.get("matched_id"),
+            matched_anime_native=d.get("matched_anime_native"),
+            score=d.get("score"),
+            num_comments=d.get("num_comments"),
+            url=d.get("url"),
+            seasonYear=d.get("seasonYear"),
+            season=d.get("season"),
+            episode=d.get("episode"),
+            reddit_id=d.get("reddit_id") or d.get("id"),
+            created_utc=d.get("created_utc") or d.get("created"),
+            matched_title=d.get("matched_title"),
+        )
+
+    def to_dict(self) -> dict:
+        d = {}
+        for k in self.__slots__:
+            v = getattr(self, k)
+            if k in self.OPTIONAL and v is None:
+                continue
+            d[k] = v
+        return d
+
+
+class ArchivedPost:
+    """シーズンファイル（data/reddit/*.json）の episodes に入る投稿 1 件"""
+
+    __slots__ = ("reddit_id", "reddit_title", "created_utc", "num_comments", "url", "archived_at")
+
+    def __init__(self, reddit_id, reddit_title, created_utc=None, num_comments=None, url=None,
+                 archived_at=None):
+        self.reddit_id = reddit_id
+        self.reddit_title = reddit_title
+        self.created_utc = created_utc
+        self.num_comments = num_comments
+        self.url = url
+        self.archived_at = archived_at
+
+    @staticmethod
+    def is_record(d: dict) -> bool:
+        return "reddit_id" in d and "reddit_title" in d
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            reddit_id=d.get("reddit_id"),
+            reddit_title=d.get("reddit_title") or "",
+            created_utc=d.get("created_utc"),
+            num_comments=d.get("num_comments"),
+            url=d.get("url"),
+            archived_at=d.get("archived_at"),
+        )
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# ========================
+# JSON 入出力
+# ========================
+_CHUNK_SIZE = 1 << 16
+_WS = " \t\r\n"
+# 文字列を読み飛ばしつつ、次の { [ } を探す（object がネストしているかの判定用）
+# 閉じていない文字列はバッファの終端まで 1 つの文字列として読む
+_NEXT_BRACKET_RE = re.compile(r'"(?:[^"\\]|\\.)*"?|[{}\[\]]')
+# 数値・true/false/null の終わり（これがバッファに来るまでは値が途中で切れている可能性がある）
+_SCALAR_END_RE = re.compile(r"[\s,\]}]")
+
+
+class _Stream:
+    """ファイルを _CHUNK_SIZE ずつ読み、消費済みの先頭を捨てながら保持するバッファ"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fp.read(_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """空白・カンマ・コロンを読み飛ばして次の文字を返す（ファイル末尾なら ""）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS + ",:":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.more():
+                return self.buf[self.pos:self.pos + 1]
+
+    def decode(self, decoder):
+        """pos から始まる値（スカラーまたはネストのない object）を C 実装のデコーダで読む"""
+        if self.buf[self.pos] not in '"{':
+            while not _SCALAR_END_RE.search(self.buf, self.pos) and self.more():
+                pass
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 文字列やネストのない object がバッファの終端で切れている
+                if self.more():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+    def flat_object(self) -> bool:
+        """pos の { がネストを含まない object（} が先に来る）かどうか"""
+        while True:
+            for m in _NEXT_BRACKET_RE.finditer(self.buf, self.pos + 1):
+                token = m.group()
+                if token[0] != '"':
+                    return token == "}"
+                if m.end() == len(self.buf):
+                    break  # 文字列がバッファの終端で切れている
+            if not self.more():
+                raise json.JSONDecodeError("Unterminated object", self.buf, self.pos)
+
+
+def load_json(fp, record_cls):
+    """
+    ファイル fp の JSON を読み込み、record_cls.is_record に当てはまる object を record_cls に変換する。
+    それ以外の object（シーズンファイルの作品エントリなど）は dict のまま返す。
+
+    ファイル全体を文字列として読み込まず、_CHUNK_SIZE ずつ読みながら組み立てるので、
+    メモリに載るのは変換後のデータとチャンク 1 つ分だけになる。
+    ネストのない object（投稿 1 件）は json の C 実装でまとめて読み、そのままレコードにする。
+    """
+    def hook(d):
+        return record_cls.from_dict(d) if record_cls.is_record(d) else d
+
+    decoder = json.JSONDecoder(object_hook=hook)
+    stream = _Stream(fp)
+    stack = []  # [(container, key)]：開いている dict / list と、dict なら次の値のキー
+    key = None
+    keys = {}  # 同じキー文字列を共有する（json.load と同じ）
+    while True:
+        c = stream.peek()
+        if not c:
+            raise json.JSONDecodeError("Expecting value", stream.buf, stream.pos)
+
+        if c in "}]":
+            stream.pos += 1
+            value, key = stack.pop()
+            if isinstance(value, dict):
+                value = hook(value)
+        elif isinstance(stack[-1][0] if stack else None, dict) and key is None:
+            # dict のキー
+            key = stream.decode(decoder)
+            key = keys.setdefault(key, key)
+            continue
+        elif c == "[":
+            stream.pos += 1
+            stack.append(([], key))
+            key = None
+            continue
+        elif c == "{" and not stream.flat_object():
+            stream.pos += 1
+            stack.append(({}, key))
+            key = None
+            continue
+        else:
+            value = stream.decode(decoder)
+
+        if not stack:
+            return value
+        container = stack[-1][0]
+        if isinstance(container, dict):
+            container[key] = value
+            key = None
+        else:
+            container.append(value)
+
+
+def _encode(obj):
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(data, fp):
+    """レコードを含むデータを従来と同じ形式（ensure_ascii=False, indent=2）で書き出す"""
+    json.dump(data, fp, ensure_ascii=False, indent=2, default=_encode)
+
+
+def dumps_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2, default=_encode)
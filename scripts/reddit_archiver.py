@@ -1,12 +1,19 @@
 import json
 import os
 import re
-import shutil
 from datetime import datetime
 from typing import Optional
 
+from change_manifest import ChangeTracker
+from export_shards import publish
+from records import ArchivedPost, MatchResult, dump_json, load_json
+
 SEASON_ORDER = {"WINTER": 1, "SPRING": 2, "SUMMER": 3, "FALL": 4}
 
+# 全シーズン横断のアーカイブ済み投稿インデックス（投稿ID -> 保存先）
+POST_INDEX_PATH = "data/archived_posts.json"
+POST_INDEX_VERSION = 1
+
 EP_PATTERNS = [
     re.compile(r"第\s*(\d{1,3})\s*話"),
     re.compile(r"\bep(?:isode)?\.?\s*(\d{1,3})\b", re.I),
@@ -17,7 +24,7 @@ EP_PATTERNS = [
     re.compile(r"\bepisode\s+(\d{1,3})\b", re.I),
 ]
 
-def _extract_episode(title: str) -> Optional[int]:
+def extract_episode(title: str) -> Optional[int]:
     for p in EP_PATTERNS:
         m = p.search(title or "")
         if m:
@@ -27,10 +34,13 @@ def _extract_episode(title: str) -> Optional[int]:
                 continue
     return None
 
-def _load_json(path: str):
+def _load_json(path: str, record_cls=None):
+    """record_cls を渡すと、その形の object を読み込みながらレコードに変換する"""
     if not os.path.exists(path):
         return None
     with open(path, "r", encoding="utf-8") as f:
+        if record_cls is not None:
+            return load_json(f, record_cls)
         return json.load(f)
 
 def _save_json(path: str, data):
@@ -38,7 +48,52 @@ def _save_json(path: str, data):
     if dirp:
         os.makedirs(dirp, exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        dump_json(data, f)
+
+def _post_key(url_or_id: str) -> str:
+    # https://www.reddit.com/r/anime/comments/<id>/... -> <id>
+    if url_or_id and "/comments/" in url_or_id:
+        return url_or_id.split("/comments/")[1].split("/")[0]
+    return url_or_id
+
+def build_post_index(out_dir: str = "data/reddit") -> dict:
+    """
+    Rebuild the archived-post index by scanning every season file.
+    Maps post id -> "<season file key>/<anilist_id>/<episode>".
+    Entries are kept when a later post replaces an episode, so two threads for
+    the same episode do not overwrite each other on every run.
+    """
+    index = {}
+    for fname in sorted(os.listdir(out_dir)) if os.path.isdir(out_dir) else []:
+        if not fname.endswith(".json") or fname == "seasons.json":
+            continue
+        data = _load_json(os.path.join(out_dir, fname), ArchivedPost)
+        if not isinstance(data, dict) or not isinstance(data.get("anime"), dict):
+            continue
+        season_key = fname[:-len(".json")]
+        for anime_key, anime_entry in data["anime"].items():
+            for ep_key, posts in (anime_entry.get("episodes") or {}).items():
+                for post in posts:
+                    pid = _post_key(post.url or post.reddit_id)
+                    if pid:
+                        index[pid] = f"{season_key}/{anime_key}/{ep_key}"
+    return index
+
+def _load_post_index(index_path: str, out_dir: str) -> tuple[dict, bool]:
+    """Return (posts, rebuilt); rebuilt is True when the index had to be rebuilt and should be saved."""
+    data = _load_json(index_path)
+    if isinstance(data, dict) and data.get("version") == POST_INDEX_VERSION:
+        return data["posts"], False
+    # missing or outdated -> rebuild from the archives
+    return build_post_index(out_dir), True
+
+def _save_post_index(index_path: str, posts: dict):
+    _save_json(index_path, {"version": POST_INDEX_VERSION, "posts": posts})
+
+def rebuild_post_index(out_dir: str = "data/reddit", index_path: str = POST_INDEX_PATH) -> dict:
+    posts = build_post_index(out_dir)
+    _save_post_index(index_path, posts)
+    return posts
 
 def _japanese_title_from_anilist(anime: dict) -> str:
     # try common shapes used in this project
@@ -55,6 +110,7 @@ def archive_reddit_latest(
     matched_path: str = "data/matched_results.json",
     anilist_path: str = "data/anilist.json",
     out_dir: str = "data/reddit",
+    index_path: str = POST_INDEX_PATH,
 ):
     """
     Read matched_results_latest-Episode.json (produced by match_titles.py),
@@ -82,8 +138,11 @@ def archive_reddit_latest(
         ...
       }
     }
+
+    Posts already archived at the same season/anime/episode (looked up in
+    index_path) are dropped before any season file is opened.
     """
-    matched = _load_json(matched_path)
+    matched = _load_json(matched_path, MatchResult)
     if matched is None:
         raise FileNotFoundError(f"{matched_path} not found")
 
@@ -97,12 +156,15 @@ def archive_reddit_latest(
     else:
         items = [matched]
 
-    summary = {"processed": 0, "archived": 0, "skipped_no_match": 0, "skipped_invalid": 0}
+    tracker = ChangeTracker("archive", out_dir)
+    post_index, index_changed = _load_post_index(index_path, out_dir)
+
+    summary = {"processed": 0, "archived": 0, "skipped_no_match": 0, "skipped_invalid": 0, "skipped_archived": 0}
     for entry in items:
         summary["processed"] += 1
 
-        reddit_title = entry.get("reddit_title") or entry.get("title") or ""
-        matched_id = entry.get("matched_anime_id") or entry.get("matched_anime") or entry.get("matched_id")
+        reddit_title = entry.reddit_title
+        matched_id = entry.matched_anime_id
         if matched_id is None:
             summary["skipped_no_match"] += 1
             continue
@@ -115,15 +177,15 @@ def archive_reddit_latest(
 
         anime = anilist_map.get(mid)
         # season/year prefer matched entry, fallback to anilist
-        season = entry.get("season") or (anime.get("season") if anime else None)
-        sy = entry.get("seasonYear") or (anime.get("seasonYear") if anime else None)
+        season = entry.season or (anime.get("season") if anime else None)
+        sy = entry.seasonYear or (anime.get("seasonYear") if anime else None)
         if not season or not sy:
             summary["skipped_no_match"] += 1
             continue
 
-        ep = entry.get("episode")
+        ep = entry.episode
         if ep is None:
-            ep = _extract_episode(reddit_title)
+            ep = extract_episode(reddit_title)
 
         # Skip if not a discussion thread or no episode number found
         if "discussion" not in reddit_title.lower() or ep is None:
@@ -136,10 +198,23 @@ def archive_reddit_latest(
             summary["skipped_invalid"] += 1
             continue
 
-        fname = f"{year}_{idx}_{season.lower()}.json"
+        season_key = f"{year}_{idx}_{season.lower()}"
+        fname = f"{season_key}.json"
         fpath = os.path.join(out_dir, fname)
 
-        existing = _load_json(fpath)
+        # choose episode bucket
+        ep_key = str(ep) if ep is not None else "_unknown"
+
+        # Already archived at the same place -> nothing to do, skip without opening the season file
+        rid = entry.reddit_id or entry.url or reddit_title
+        pid = _post_key(entry.url or rid)
+        location = f"{season_key}/{mid}/{ep_key}"
+        if post_index.get(pid) == location:
+            summary["skipped_archived"] += 1
+            continue
+
+        tracker.touch(season_key)
+        existing = _load_json(fpath, ArchivedPost)
         if existing is None or not isinstance(existing, dict):
             # initialize new structure
             existing = {
@@ -154,7 +229,7 @@ def archive_reddit_latest(
         if anime_key not in existing["anime"]:
             existing["anime"][anime_key] = {
                 "id": mid,
-                "name_jp": _japanese_title_from_anilist(anime) or entry.get("matched_anime_native") or entry.get("matched_title") or "",
+                "name_jp": _japanese_title_from_anilist(anime) or entry.matched_anime_native or entry.matched_title or "",
                 "seasonYear": sy,
                 "season": season,
                 "episodes": {},   # map episode -> [posts]
@@ -163,32 +238,32 @@ def archive_reddit_latest(
 
         anime_entry = existing["anime"][anime_key]
 
-        # choose episode bucket
-        ep_key = str(ep) if ep is not None else "_unknown"
-
         # prepare post record
-        rid = entry.get("reddit_id") or entry.get("id") or entry.get("url") or reddit_title
-        post_record = {
-            "reddit_id": rid,
-            "reddit_title": reddit_title,
-            "created_utc": entry.get("created_utc") or entry.get("created"),
-            "num_comments": entry.get("num_comments"),
-            "url": entry.get("url"),
-            "archived_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        }
+        post_record = ArchivedPost(
+            reddit_id=rid,
+            reddit_title=reddit_title,
+            created_utc=entry.created_utc,
+            num_comments=entry.num_comments,
+            url=entry.url,
+            archived_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        )
 
         # Get the list of existing posts for the episode, if any.
         existing_posts = anime_entry["episodes"].get(ep_key)
 
         # If there are existing posts and the URL of the first one matches the new one,
         # then there's no change, so we can skip processing this entry.
-        if existing_posts and existing_posts[0].get("url") == post_record.get("url"):
+        if existing_posts and existing_posts[0].url == post_record.url:
+            post_index[pid] = location
+            index_changed = True
             continue
 
         # Otherwise, this is either a completely new episode record, or an existing
         # one with an updated URL. In both cases, we overwrite the entry to store
         # the latest post. The list structure is kept for compatibility.
         anime_entry["episodes"][ep_key] = [post_record]
+        post_index[pid] = location
+        index_changed = True
 
         # update latest_episode numeric if applicable
         try:
@@ -202,12 +277,15 @@ def archive_reddit_latest(
         _save_json(fpath, existing)
         summary["archived"] += 1
 
-    # 最新のデータを astro/public/data/reddit にコピーする
-    shutil.copytree(
-        "./data/reddit",
-        "./astro/public/data/reddit",
-        dirs_exist_ok=True
-    )
+    if index_changed:
+        _save_post_index(index_path, post_index)
+
+    # 変更のあったシーズンを data/changes.json に書き出す
+    changed = tracker.finish()
+
+    # 変更のあったシーズンだけを astro/public/data/reddit にコピーし、マニフェストとシャードを書き出す
+    if changed:
+        publish(seasons=list(changed))
 
     return summary
 
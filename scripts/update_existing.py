@@ -3,35 +3,20 @@ import time
 import requests
 from datetime import datetime
 from pathlib import Path
-import shutil
-import praw
 import os
 
+from change_manifest import ChangeTracker
+from export_shards import publish
+from fetch_r_anime import create_reddit
+from records import ArchivedPost, dump_json, load_json
+
 SEASON_COUNT = 4  # 直近何シーズン分を更新するか 1~
 EPISODE_COUNT = 6  # 直近何話分を更新するか 1~
-
-# 環境変数から取得
-CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
-CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
-USERNAME = os.getenv("REDDIT_USERNAME")
-PASSWORD = os.getenv("REDDIT_PASSWORD")
-USER_AGENT = os.getenv("REDDIT_USER_AGENT", "r-anime-scraper/0.1 by example")
-
-if not all([CLIENT_ID, CLIENT_SECRET, USERNAME, PASSWORD]):
-    raise SystemExit("Missing Reddit credentials in environment variables.")
-
-reddit = praw.Reddit(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    username=USERNAME,
-    password=PASSWORD,
-    user_agent=USER_AGENT,
-    check_for_updates=False,
-    ratelimit_seconds=60
-)
+CHECKPOINT_PATH = Path("data/update_checkpoint.json")  # 中断時の再開用チェックポイント
+CHECKPOINT_INTERVAL = 20  # 何件処理するごとにチェックポイントを保存するか
 
 # PRAWを使ったコメント数取得
-def fetch_comment_count_praw(reddit_url):
+def fetch_comment_count_praw(reddit, reddit_url):
     post_id = reddit_url.split("/comments/")[1].split("/")[0]
     submission = reddit.submission(id=post_id)
     return submission.num_comments
@@ -65,7 +50,7 @@ def get_season_keys(back=2):
 
     return keys
 
-# 対象投稿イテレータ
+# 対象投稿イテレータ（ArchivedPost を返す）
 def iter_target_posts(data):
     for anime in data["anime"].values():
         latest = anime.get("latest_episode")
@@ -80,64 +65,150 @@ def iter_target_posts(data):
             for post in posts:
                 yield post
 
-season_keys = get_season_keys(SEASON_COUNT)
-
+# JSONを一時ファイル経由で書き込む（途中でクラッシュしても壊れたファイルを残さない）
+def save_json_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        dump_json(data, f)
+    os.replace(tmp, path)
+
+# チェックポイント読み込み
+# {"started_at": "...", "processed": {"2026_3_summer": ["<reddit_id>", ...]}}
+def load_checkpoint():
+    if not CHECKPOINT_PATH.exists():
+        return {"started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "processed": {}}
+    with CHECKPOINT_PATH.open(encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    checkpoint.setdefault("processed", {})
+    print("resuming from checkpoint started at", checkpoint.get("started_at"))
+    return checkpoint
+
+# シーズンファイルとチェックポイントを保存
+# シーズンファイルを先に書くので、間でクラッシュしても更新済みのコメント数は失われない
+# （カーソルが古いままなら該当投稿を再取得するだけ）
+# コメント数が 1 件も変わっていなければシーズンファイルは書き換えない
+def save_progress(path, data, checkpoint, dirty=True):
+    if dirty:
+        save_json_atomic(path, data)
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    save_json_atomic(CHECKPOINT_PATH, checkpoint)
 
 MAX_403 = 3 # 403エラーが連続したら中断する
-count_403 = 0
-
-# 各シーズンファイルを更新
-for key in season_keys:
-    path = Path(f"data/reddit/{key}.json")
-    if not path.exists():
-        continue
-
-    print("updating:", path)
-
-    with path.open(encoding="utf-8") as f:
-        data = json.load(f)
-
-    updated = 0
-    checked = 0
-    for post in iter_target_posts(data):
-        try:
-            # コメント数取得
-            new_count = fetch_comment_count_praw(post["reddit_id"])
-            old_count = post.get("num_comments")
-
-            # 更新があれば反映
-            if old_count != new_count:
-                post["num_comments"] = new_count
-                post["archived_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                updated += 1
-            checked += 1
-            time.sleep(1.5) # API負荷を下げるためにわずかに待つ
-        except requests.exceptions.HTTPError as e:
-            if e.response is not None and e.response.status_code == 403:
-                count_403 += 1
-                print(f"403 skip ({count_403}/{MAX_403}):", post["reddit_id"])
-
-                if count_403 >= MAX_403:
-                    print("Too many 403s, abort this season")
-                    break   # ← このシーズンを中断
-
-                time.sleep(10)  # クールダウン
-                continue
-            else:
-                print("HTTP error:", post["reddit_id"], e)
 
-        except Exception as e:
-            print("other error:", post["reddit_id"], e)
+# 直近シーズンのコメント数を更新する
+# 403 が続いて中断した場合は aborted=True を返し、チェックポイントは次回に持ち越す
+# max_posts を渡すとその件数を取得した時点で止め（completed=False）、続きはチェックポイントから再開する
+def update_seasons(reddit, season_keys=None, max_posts=None):
+    if season_keys is None:
+        season_keys = get_season_keys(SEASON_COUNT)
+
+    count_403 = 0
+    aborted = False
+    paused = False  # max_posts に達して途中で止めたか
+    fetched = 0
+    total_checked = 0
+    total_updated = 0
+    tracker = ChangeTracker("update")
+
+    checkpoint = load_checkpoint()
+
+    # 各シーズンファイルを更新
+    for key in season_keys:
+        if paused:
+            break
+        path = Path(f"data/reddit/{key}.json")
+        if not path.exists():
+            continue
+
+        print("updating:", path)
+        tracker.touch(key)
 
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        with path.open(encoding="utf-8") as f:
+            data = load_json(f, ArchivedPost)
 
-    print("checked posts:", checked)
-    print("updated posts:", updated)
+        # 前回中断時までに処理済みの投稿はスキップする
+        processed = checkpoint["processed"].setdefault(key, [])
+        processed_ids = set(processed)
 
-# 最新のデータを astro/public/data/reddit にコピーする
-shutil.copytree(
-    "./data/reddit",
-    "./astro/public/data/reddit",
-    dirs_exist_ok=True
-)
\ No newline at end of file
+        updated = 0
+        checked = 0
+        skipped = 0
+        saved_updated = 0  # 最後にシーズンファイルを保存した時点の updated
+        for post in iter_target_posts(data):
+            if post.reddit_id in processed_ids:
+                skipped += 1
+                continue
+            if max_posts is not None and fetched >= max_posts:
+                paused = True
+                break
+            fetched += 1
+            try:
+                # コメント数取得
+                new_count = fetch_comment_count_praw(reddit, post.reddit_id)
+                old_count = post.num_comments
+
+                # 更新があれば反映
+                if old_count != new_count:
+                    post.num_comments = new_count
+                    post.archived_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    updated += 1
+                checked += 1
+                processed.append(post.reddit_id)
+                processed_ids.add(post.reddit_id)
+                if checked % CHECKPOINT_INTERVAL == 0:
+                    save_progress(path, data, checkpoint, dirty=updated > saved_updated)
+                    saved_updated = updated
+                time.sleep(1.5) # API負荷を下げるためにわずかに待つ
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 403:
+                    count_403 += 1
+                    print(f"403 skip ({count_403}/{MAX_403}):", post.reddit_id)
+
+                    if count_403 >= MAX_403:
+                        print("Too many 403s, abort this season")
+                        aborted = True
+                        break   # ← このシーズンを中断（次回はチェックポイントから再開）
+
+                    time.sleep(10)  # クールダウン
+                    continue
+                else:
+                    print("HTTP error:", post.reddit_id, e)
+
+            except Exception as e:
+                print("other error:", post.reddit_id, e)
+
+        save_progress(path, data, checkpoint, dirty=updated > saved_updated)
+
+        print("checked posts:", checked)
+        print("updated posts:", updated)
+        print("skipped posts (already processed):", skipped)
+        total_checked += checked
+        total_updated += updated
+
+    # 全シーズンを最後まで処理できたらチェックポイントを破棄し、次回は最初から更新する
+    completed = not aborted and not paused
+    if completed and CHECKPOINT_PATH.exists():
+        CHECKPOINT_PATH.unlink()
+        print("all seasons completed, checkpoint cleared")
+
+    # 変更のあったシーズンを data/changes.json に書き出す
+    changed = tracker.finish()
+
+    return {
+        "checked": total_checked,
+        "updated": total_updated,
+        "aborted": aborted,
+        "completed": completed,
+        "changed": list(changed),
+    }
+
+def main():
+    reddit = create_reddit()
+    summary = update_seasons(reddit)
+
+    # 変更のあったシーズンだけを astro/public/data/reddit にコピーし、マニフェストとシャードを書き出す
+    if summary["changed"]:
+        publish(seasons=summary["changed"])
+
+if __name__ == "__main__":
+    main()
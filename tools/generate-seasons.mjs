@@ -11,6 +11,18 @@ const seasonLabel = {
   fall: "秋",
 };
 
+// data/changes.json（Python 側のステージが出力）を見て、シーズンの追加・削除がなければ何もしない
+// seasons.json はシーズンの一覧だけなので、既存シーズンの中身が変わっても作り直す必要はない
+const CHANGES_FILE = "data/changes.json";
+if (fs.existsSync(CHANGES_FILE) && fs.existsSync(OUT_FILE)) {
+  const { changed = {} } = JSON.parse(fs.readFileSync(CHANGES_FILE, "utf-8"));
+  const added = Object.values(changed).some(c => c.before === null || c.after === null);
+  if (!added) {
+    console.log("no seasons added or removed, seasons.json unchanged");
+    process.exit(0);
+  }
+}
+
 const files = fs.readdirSync(SRC_DIR).filter(f => f.endsWith(".json"));
 
 const seasons = files.map(file => {